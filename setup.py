@@ -65,12 +65,10 @@ setup(
     'Intended Audience :: Developers',
     'License :: OSI Approved :: MIT License',  
     'Programming Language :: Python :: 3',
-    'Programming Language :: Python :: 3.5',
-    'Programming Language :: Python :: 3.6',
     'Programming Language :: Python :: 3.7',
     'Programming Language :: Python :: 3.8',
     'Programming Language :: Python :: 3.9',
     'Programming Language :: Python :: 3.10'
   ],
-  python_requires='>=3.5'
+  python_requires='>=3.7'
 )
@@ -4,10 +4,20 @@ import os
 import sys
 import time
 import logging
+import concurrent.futures
 from .network import Net
 
 log = logging.getLogger(__name__)
 
+# Executor for merging downloaded parts in AsyncFastFileDownloader,
+# passed explicitly so default executor of the event loop is not touched.
+# There is one merge per file, so this is sized like the default
+# download concurrency of download_coro()
+_IO_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8,
+    thread_name_prefix='zippy-io'
+)
+
 # re.compile('bytes=([0-9]{1,}|)-([0-9]{1,}|)', re.IGNORECASE)
 
 class BaseDownloader:
@@ -19,19 +29,7 @@ class BaseDownloader:
         "Do the cleanup, Maybe close the session or the progress bar ? idk."
         raise NotImplementedError
 
-class FileDownloader(BaseDownloader):
-    def __init__(self, url, file, progress_bar=True, replace=False, **headers) -> None:
-        self.url = url
-        self.file = str(file) + '.temp'
-        self.real_file = file
-        self.progress_bar = progress_bar
-        self.replace = replace
-        self.headers_request = headers
-        if headers.get('Range') is not None and self._get_file_size(self.file):
-            raise ValueError('"Range" header is not supported while in resume state')
-
-        self._tqdm = None
-    
+    # Progress bar helpers for non-async downloaders
     def _build_progres_bar(self, initial_size, file_sizes, desc='file_sizes'):
         if self.progress_bar:
             kwargs = {
@@ -60,6 +58,39 @@ class FileDownloader(BaseDownloader):
         if self._tqdm:
             self._tqdm.update(n)
 
+    def _write_response(self, resp, write):
+        """Read ``resp`` in chunks, pass them to ``write`` and return total written bytes"""
+        # Heavily adapted from https://github.com/choldgraf/download/blob/master/download/download.py#L377-L390
+        chunk_size = 2 ** 16
+        written = 0
+        while True:
+            t0 = time.time()
+            chunk = resp.raw.read(chunk_size)
+            dt = time.time() - t0
+            if dt < 0.005:
+                chunk_size *= 2
+            elif dt > 0.1 and chunk_size > 2 ** 16:
+                chunk_size = chunk_size // 2
+            if not chunk:
+                break
+            write(chunk)
+            written += len(chunk)
+            self._update_progress_bar(len(chunk))
+        return written
+
+class FileDownloader(BaseDownloader):
+    def __init__(self, url, file, progress_bar=True, replace=False, **headers) -> None:
+        self.url = url
+        self.file = str(file) + '.temp'
+        self.real_file = file
+        self.progress_bar = progress_bar
+        self.replace = replace
+        self.headers_request = headers
+        if headers.get('Range') is not None and self._get_file_size(self.file):
+            raise ValueError('"Range" header is not supported while in resume state')
+
+        self._tqdm = None
+    
     def _get_file_size(self, file):
         if os.path.exists(file):
             return os.path.getsize(file)
@@ -99,21 +130,8 @@ class FileDownloader(BaseDownloader):
         # Build the progress bar
         self._build_progres_bar(initial_file_sizes, float(file_sizes))
 
-        # Heavily adapted from https://github.com/choldgraf/download/blob/master/download/download.py#L377-L390
-        chunk_size = 2 ** 16
         with open(self.file, 'ab' if initial_file_sizes else 'wb') as writer:
-            while True:
-                t0 = time.time()
-                chunk = resp.raw.read(chunk_size)
-                dt = time.time() - t0
-                if dt < 0.005:
-                    chunk_size *= 2
-                elif dt > 0.1 and chunk_size > 2 ** 16:
-                    chunk_size = chunk_size // 2
-                if not chunk:
-                    break
-                writer.write(chunk)
-                self._update_progress_bar(len(chunk))
+            self._write_response(resp, writer.write)
         
         # Delete original file if replace is True and real file is exist
         if real_file_sizes and self.replace:
@@ -125,6 +143,41 @@ class FileDownloader(BaseDownloader):
         if self._tqdm:
             self._tqdm.close()
 
+class StreamDownloader(BaseDownloader):
+    """Downloader that pass downloaded chunks to ``writer`` callable instead of writing to a file"""
+    def __init__(self, url, writer, progress_bar=True, **headers) -> None:
+        self.url = url
+        self.writer = writer
+        self.progress_bar = progress_bar
+        self.headers_request = headers
+
+        self._tqdm = None
+
+    def download(self):
+        # Initiate request
+        resp = Net.requests.get(self.url, headers=self.headers_request, stream=True)
+        try:
+            resp.raise_for_status()
+
+            # Grab the file sizes
+            file_sizes = int(resp.headers.get('Content-Length'))
+
+            # Build the progress bar
+            self._build_progres_bar(0, float(file_sizes))
+
+            written = self._write_response(resp, self.writer)
+        finally:
+            resp.close()
+
+        # Make sure the file is not truncated
+        if written != file_sizes:
+            raise IOError('Incomplete download, got %s bytes out of %s bytes' % (written, file_sizes))
+
+    def cleanup(self):
+        # Close the progress bar
+        if self._tqdm:
+            self._tqdm.close()
+
 class StdoutDownloader(BaseDownloader):
     def __init__(self, url) -> None:
         self.url = url
@@ -407,8 +460,8 @@ class AsyncFastFileDownloader(BaseDownloader):
 
         await asyncio.gather(fut1, fut2)
 
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: self._merge_files([1, 2], file_sizes))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_IO_EXECUTOR, self._merge_files, [1, 2], file_sizes)
 
         for part in [1,2]:
             os.remove(self._get_temp_file(part))
@@ -1,13 +1,24 @@
 # zipyshare-downloader
 # fetcher.py
 
+import re
+import os
+import atexit
+import multiprocessing
 import asyncio
 import aiohttp
 import requests
 import asyncio
 import logging
+import codecs
+import time
+import zipfile
+import concurrent.futures
+import urllib.parse
+from collections import defaultdict
+from pathlib import Path
 from typing import List, Dict
-from .utils import extract_archived_file, build_pretty_list_log, archive_zip
+from .utils import extract_archived_file, extract_archived_files, build_pretty_list_log, archive_zip, to_thread
 from .errors import FileExpired
 from .parser import finalization_info, parse_info
 from .file import File
@@ -23,34 +34,138 @@ __all__ = (
 
 log = logging.getLogger(__name__)
 
-def get_info(url) -> Dict[str, str]:
+# Dedicated executor for zipping and unzipping files,
+# so archive works doesn't take threads from default executor
+_ARCHIVE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2,
+    thread_name_prefix='zippy-archive'
+)
+
+# Process pool for unzip_executor='process', created on first use
+_PROCESS_EXECUTOR = None
+
+# Error messages from Zippyshare if file is expired or not exist,
+# checked in one pass through response body
+_ERR_RE = re.compile(
+    r'File (has expired and does not exist anymore on this server|does not exist on this server)'
+)
+
+# Size of chunks when reading Zippyshare page and how many characters
+# from previous chunk are kept, so error messages splitted between
+# two chunks are still found
+_BODY_CHUNK_SIZE = 16384
+_BODY_TAIL_SIZE = 64
+
+def _get_process_executor():
+    # Only file paths are sent to the worker processes, so pickling cost is negligible.
+    # But every worker process costs around 20 MB of memory,
+    # that's why this is opt-in and limited to 4 workers.
+    # "spawn" is used because forking this process (which already running
+    # executor and aiohttp resolver threads) can deadlock
+    global _PROCESS_EXECUTOR
+    if _PROCESS_EXECUTOR is None:
+        _PROCESS_EXECUTOR = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(4, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        atexit.register(_shutdown_process_executor)
+    return _PROCESS_EXECUTOR
+
+def _shutdown_process_executor():
+    global _PROCESS_EXECUTOR
+    if _PROCESS_EXECUTOR is not None:
+        _PROCESS_EXECUTOR.shutdown()
+        _PROCESS_EXECUTOR = None
+
+def _check_unzip_executor(unzip_executor):
+    if unzip_executor not in ('thread', 'process'):
+        raise ValueError("unzip_executor must be 'thread' or 'process', not %r" % unzip_executor)
+
+def _log_connection(url):
+    log.info('Grabbing required informations in %s', url)
+    log.debug('Establishing connection to Zippyshare.')
+
+def _check_body(body: str) -> None:
+    # Raise error if Zippyshare page telling the file is expired or not exist
+    m = _ERR_RE.search(body)
+    if m is None:
+        return
+    if m.group(1).startswith('has'):
+        log.exception('File has expired and does not exist anymore')
+        raise FileExpired('File has expired and does not exist anymore')
+    log.exception('File does not exist on this server')
+    raise FileNotFoundError('File does not exist on this server')
+
+def _check_concurrency(name, value):
+    # bool is subclass of int, but True/False is not valid number of slots
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError("%s must be a positive integer, not %r" % (name, value))
+
+def _scan_body_chunk(chunks, tail, chunk):
+    # Check error messages in new chunk and store it,
+    # return new tail and ``True`` if end of html page is reached
+    window = tail + chunk
+    _check_body(window)
+    chunks.append(chunk)
+    return window[-_BODY_TAIL_SIZE:], '</html>' in window
+
+def _read_body(r) -> str:
+    # Read Zippyshare page in chunks and fail as soon as error messages found
+    chunks = []
+    tail = ''
+    # Make sure iter_content() decode the chunks
+    r.encoding = r.encoding or 'utf-8'
+    try:
+        for chunk in r.iter_content(chunk_size=_BODY_CHUNK_SIZE, decode_unicode=True):
+            tail, end = _scan_body_chunk(chunks, tail, chunk)
+            if end:
+                break
+    finally:
+        r.close()
+    return ''.join(chunks)
+
+async def _read_body_coro(r) -> str:
+    # Same like _read_body() but for aiohttp response
+    chunks = []
+    tail = ''
+    decoder = codecs.getincrementaldecoder(r.charset or 'utf-8')(errors='replace')
+    try:
+        async for chunk in r.content.iter_chunked(_BODY_CHUNK_SIZE):
+            tail, end = _scan_body_chunk(chunks, tail, decoder.decode(chunk))
+            if end:
+                break
+        else:
+            _scan_body_chunk(chunks, tail, decoder.decode(b'', final=True))
+    finally:
+        r.release()
+    return ''.join(chunks)
+
+def get_info(url, session=None) -> Dict[str, str]:
     """
     Get informations in Zippyshare url.
 
     This function will return raw information from given zippyshare url
     which in :class:`dict` data type. Normally you don't use this
     , this will be used in :meth:`extract_info` and :meth:`download`.
+
+    If ``session`` is not given, shared session from :class:`NetworkObject` will be used.
     """
-    log.info('Grabbing required informations in %s' % url)
-    log.debug('Establishing connection to Zippyshare.')
-    r = Net.requests.get(url)
+    if session is None:
+        session = Net.requests
+    _log_connection(url)
+    r = session.get(url, stream=True)
     try:
         r.raise_for_status()
     except requests.HTTPError as e:
         log.exception('Zippyshare send %s code' % r.status_code)
+        r.close()
         raise e from None
     log.debug('Successfully established connection to Zippyshare.')
-    log.debug('Checking if file is not expired')
-    if 'File has expired and does not exist anymore on this server' in r.text:
-        log.exception('File has expired and does not exist anymore')
-        raise FileExpired('File has expired and does not exist anymore')
-    log.debug('Checking if file is exist')
-    if 'File does not exist on this server' in r.text:
-        log.exception('File does not exist on this server')
-        raise FileNotFoundError('File does not exist on this server')
-    return finalization_info(parse_info(url, r.text))
+    log.debug('Checking if file is not expired and exist')
+    body_html = _read_body(r)
+    return finalization_info(parse_info(url, body_html), session=session)
 
-async def get_info_coro(url) -> Dict[str, str]:
+async def get_info_coro(url, session=None) -> Dict[str, str]:
     """
     "Coroutine function"
 
@@ -59,26 +174,59 @@ async def get_info_coro(url) -> Dict[str, str]:
     This function will return raw information from given zippyshare url
     which in :class:`dict` data type. Normally you don't use this
     , this will be used in :meth:`extract_info_coro` and :meth:`download_coro`.
+
+    If ``session`` is not given, shared session from :class:`NetworkObject` will be used.
     """
-    log.info('Grabbing required informations in %s' % url)
-    log.debug('Establishing connection to Zippyshare.')
-    r = await Net.aiohttp.get(url)
+    if session is None:
+        session = Net.aiohttp
+    _log_connection(url)
+    r = await session.get(url)
     try:
         r.raise_for_status()
     except aiohttp.ClientResponseError as e:
         log.exception('Zippyshare send %s code' % r.status)
+        r.release()
         raise e from None
-    body_html = await r.text()
     log.debug('Successfully established connection to Zippyshare.')
-    log.debug('Checking if file is not expired')
-    if 'File has expired and does not exist anymore on this server' in body_html:
-        log.exception('File has expired and does not exist anymore')
-        raise FileExpired('File has expired and does not exist anymore')
-    log.debug('Checking if file is exist')
-    if 'File does not exist on this server' in body_html:
-        log.exception('File does not exist on this server')
-        raise FileNotFoundError('File does not exist on this server')
-    return await finalization_info(parse_info(url, body_html), True)
+    log.debug('Checking if file is not expired and exist')
+    body_html = await _read_body_coro(r)
+    return await finalization_info(parse_info(url, body_html), True, session)
+
+def _download_zip(urls, zip, session, progress_bar=True, folder=None, **kwargs) -> List[File]:
+    # Stream all files directly into zip file,
+    # so downloaded files are not written to disk and then read again
+    zip_path = (Path('.') / (folder if folder else '') / zip)
+    zip_path.parent.mkdir(exist_ok=True, parents=True)
+    # Write to temporary zip file and rename it once all files are written,
+    # so failed download doesn't leave zip file with truncated file inside
+    temp_zip_path = zip_path.with_name(zip_path.name + '.temp')
+    # Duplicate urls are fetched and written only once,
+    # but still returned for every given url
+    url_files = {}
+    log.info('Zipping all downloaded files to "%s"', zip_path)
+    try:
+        with zipfile.ZipFile(temp_zip_path, 'w', compression=zipfile.ZIP_STORED) as zip_writer:
+            for url in urls:
+                if url in url_files:
+                    continue
+                info = get_info(url, session=session)
+                file = File(info)
+                url_files[url] = file
+                zip_info = zipfile.ZipInfo(file.name, date_time=time.localtime()[:6])
+                log.debug('Writing "%s" to "%s"', file.name, zip_path)
+                with zip_writer.open(zip_info, 'w', force_zip64=True) as writer:
+                    file.download_stream(writer.write, progress_bar=progress_bar)
+    except BaseException:
+        log.debug('Deleting incomplete zip file "%s"', temp_zip_path)
+        if temp_zip_path.exists():
+            os.remove(temp_zip_path)
+        raise
+    os.replace(temp_zip_path, zip_path)
+    log.info(build_pretty_list_log(
+        [file.name for file in url_files.values()],
+        'Successfully zip all downloaded files to "%s"' % zip_path
+    ))
+    return [url_files[url] for url in urls]
 
 def download(*urls, zip: str=None, unzip: bool=False, **kwargs) -> List[File]:
     """
@@ -89,7 +237,8 @@ def download(*urls, zip: str=None, unzip: bool=False, **kwargs) -> List[File]:
     *urls
         Zippyshare urls.
     zip: :class:`str`
-        Zip all downloaded files once finished.
+        Zip all downloaded files, the files are written
+        directly into zip file while downloading.
         Zip filename will be taken from ``zip`` parameter,
         default to ``None``.
         NOTE: You can't mix ``zip`` and ``unzip`` options together
@@ -111,23 +260,24 @@ def download(*urls, zip: str=None, unzip: bool=False, **kwargs) -> List[File]:
     """
     if unzip and zip:
         raise ValueError("unzip and zip paramaters cannot be set together")
+    session = Net.requests
+    if kwargs.get('filename') is not None:
+        kwargs.pop('filename')
+    if zip:
+        return _download_zip(urls, zip, session, **kwargs)
     downloaded_files = {}
-    files = []
+    # Cache informations per url, so duplicate urls are not fetched again
+    infos = {}
     for url in urls:
-        info = get_info(url)
+        info = infos.get(url)
+        if info is None:
+            info = infos[url] = get_info(url, session=session)
         file = File(info)
-        files.append(file)
-        if kwargs.get('filename') is not None:
-            kwargs.pop('filename')
         file_path = file.download(**kwargs)
         downloaded_files[file] = file_path
         if unzip:
             extract_archived_file(str(file_path))
-    if zip:
-        log.info(build_pretty_list_log(downloaded_files, 'Zipping all downloaded files to "%s"' % zip))
-        archive_zip(downloaded_files, zip)
-        log.info(build_pretty_list_log(downloaded_files, 'Successfully zip all downloaded files to "%s"' % zip))
-    return files
+    return list(downloaded_files)
 
 def extract_info(url: str, download: bool=True, unzip: bool=False, **kwargs) -> File:
     """
@@ -160,7 +310,13 @@ def extract_info(url: str, download: bool=True, unzip: bool=False, **kwargs) ->
             extract_archived_file(str(file_path))
     return file
 
-async def extract_info_coro(url: str, download: bool=True, unzip: bool=False, **kwargs) -> File:
+async def extract_info_coro(
+    url: str,
+    download: bool=True,
+    unzip: bool=False,
+    unzip_executor: str='thread',
+    **kwargs
+) -> File:
     """
     "Coroutine Function"
 
@@ -177,6 +333,13 @@ async def extract_info_coro(url: str, download: bool=True, unzip: bool=False, **
         Unzip downloaded file once finished
         (if given file is zip or tar format extract it, otherwise ignore it),
         default to ``False``.
+    unzip_executor: :class:`str`
+        Where the files are extracted if ``unzip`` is ``True``,
+        ``'thread'`` or ``'process'``, default to ``'thread'``.
+        ``'process'`` extract the files in process pool, which is faster
+        for big archives but every worker process costs around 20 MB of memory.
+        Worker processes are started with "spawn" method, so the main script
+        must be guarded with ``if __name__ == '__main__':``.
     **kwargs
         These parameters will be passed to :meth:`File.download_coro()`
 
@@ -185,16 +348,53 @@ async def extract_info_coro(url: str, download: bool=True, unzip: bool=False, **
     :class:`File`
         Zippyshare file
     """
+    _check_unzip_executor(unzip_executor)
     info = await get_info_coro(url)
     file = File(info)
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     if download:
         file_path = await file.download_coro(**kwargs)
         if unzip:
-            await loop.run_in_executor(None, lambda: extract_archived_file(str(file_path)))
+            if unzip_executor == 'process':
+                await loop.run_in_executor(_get_process_executor(), extract_archived_file, str(file_path))
+            else:
+                await to_thread(extract_archived_file, str(file_path))
     return file
 
-async def download_coro(*urls, zip: str=None, unzip: bool=False, **kwargs) -> List[File]:
+async def _process_one(url, session, sem, info_sem, host_sems, kwargs):
+    # Fetch and download a single url.
+    # Informations are fetched under ``info_sem``, which is released once
+    # the download slot is acquired. So the next urls are already resolved
+    # while previous files are still downloading, but only a limited number
+    # of them, because Zippyshare download urls are short-lived.
+    # The other semaphores limit how many files are downloaded at the same time,
+    # in total and per Zippyshare server
+    await info_sem.acquire()
+    released = False
+    try:
+        info = await get_info_coro(url, session=session)
+        file = File(info)
+        host = urllib.parse.urlparse(file.download_url).netloc
+        # Per-host slot first, so tasks waiting for a busy server
+        # don't hold global slots needed by other servers
+        async with host_sems[host], sem:
+            info_sem.release()
+            released = True
+            file_path = await file.download_coro(**kwargs)
+    finally:
+        if not released:
+            info_sem.release()
+    return file, file_path
+
+async def download_coro(
+    *urls,
+    zip: str=None,
+    unzip: bool=False,
+    unzip_executor: str='thread',
+    concurrency: int=8,
+    per_host_concurrency: int=4,
+    **kwargs
+) -> List[File]:
     """
     "Coroutine Function"
 
@@ -216,6 +416,19 @@ async def download_coro(*urls, zip: str=None, unzip: bool=False, **kwargs) -> Li
         default to ``False``.
         NOTE: You can't mix ``zip`` and ``unzip`` options together
         with value ``True``, it will raise error.
+    unzip_executor: :class:`str`
+        Where the files are extracted if ``unzip`` is ``True``,
+        ``'thread'`` or ``'process'``, default to ``'thread'``.
+        ``'process'`` extract the files in process pool, which is faster
+        for big archives but every worker process costs around 20 MB of memory.
+        Worker processes are started with "spawn" method, so the main script
+        must be guarded with ``if __name__ == '__main__':``.
+    concurrency: :class:`int`
+        Maximum number of files downloaded at the same time,
+        default to ``8``.
+    per_host_concurrency: :class:`int`
+        Maximum number of files downloaded at the same time
+        from the same Zippyshare server, default to ``4``.
     **kwargs
         These parameters will be passed to :meth:`File.download_coro()`,
         except for parameter ``filename``.
@@ -227,22 +440,51 @@ async def download_coro(*urls, zip: str=None, unzip: bool=False, **kwargs) -> Li
     """
     if unzip and zip:
         raise ValueError("unzip and zip paramaters cannot be set together")
-    loop = asyncio.get_event_loop()
+    _check_unzip_executor(unzip_executor)
+    _check_concurrency('concurrency', concurrency)
+    _check_concurrency('per_host_concurrency', per_host_concurrency)
+    loop = asyncio.get_running_loop()
+    if kwargs.get('filename') is not None:
+        kwargs.pop('filename')
+    session = Net.aiohttp
+    sem = asyncio.Semaphore(concurrency)
+    info_sem = asyncio.Semaphore(concurrency)
+    host_sems = defaultdict(lambda: asyncio.Semaphore(per_host_concurrency))
+    # Same urls will share the same task,
+    # so they are fetched and downloaded only once
+    tasks = {}
+    for url in urls:
+        if url not in tasks:
+            tasks[url] = asyncio.create_task(_process_one(url, session, sem, info_sem, host_sems, kwargs))
+    try:
+        results = await asyncio.gather(*[tasks[url] for url in urls])
+    except BaseException:
+        # One of the urls failed, stop the others
+        # instead of leaving them downloading in background
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
     downloaded_files = {}
     files = []
-    for url in urls:
-        info = await get_info_coro(url)
-        file = File(info)
+    for file, file_path in results:
         files.append(file)
-        if kwargs.get('filename') is not None:
-            kwargs.pop('filename')
-        file_path = await file.download_coro(**kwargs)
         downloaded_files[file] = file_path
-        if unzip:
-            await loop.run_in_executor(None, lambda: extract_archived_file(str(file_path)))
+    if unzip:
+        if unzip_executor == 'process':
+            # Extract the files in parallel, each file in worker process
+            executor = _get_process_executor()
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, extract_archived_file, str(file_path))
+                for file_path in downloaded_files.values()
+            ])
+        else:
+            # Extract all files in one executor call
+            # instead of dispatching every file separately
+            await loop.run_in_executor(_ARCHIVE_EXECUTOR, extract_archived_files, list(downloaded_files.values()))
     if zip:
         log.info(build_pretty_list_log(downloaded_files, 'Zipping all downloaded files to "%s"' % zip))
-        await loop.run_in_executor(None, lambda: archive_zip(downloaded_files, zip))
+        await loop.run_in_executor(_ARCHIVE_EXECUTOR, archive_zip, downloaded_files, zip)
         log.info(build_pretty_list_log(downloaded_files, 'Successfully zip all downloaded files to "%s"' % zip))
     return files
 
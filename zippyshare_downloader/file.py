@@ -3,7 +3,7 @@ import logging
 import json
 from pathlib import Path
 from datetime import datetime
-from .downloader import AsyncFastFileDownloader, AsyncFileDownloader, FileDownloader
+from .downloader import AsyncFastFileDownloader, AsyncFileDownloader, FileDownloader, StreamDownloader
 
 log = logging.getLogger(__name__)
 
@@ -93,7 +93,7 @@ class File:
         else:
             _filename = self.name
             extra_word = ''
-        log.info('Downloading "%s" %s' % (self.name, extra_word))
+        log.info('Downloading "%s" %s', self.name, extra_word)
         file_path = (Path('.') / (folder if folder else '') / _filename)
         file_path.parent.mkdir(exist_ok=True, parents=True)
         downloader = FileDownloader(
@@ -104,9 +104,33 @@ class File:
         )
         downloader.download()
         downloader.cleanup()
-        log.info('Successfully downloaded "%s" %s' % (self.name, extra_word))
+        log.info('Successfully downloaded "%s" %s', self.name, extra_word)
         return file_path
 
+    def download_stream(self, writer, progress_bar: bool=True) -> None:
+        """
+        Download this file and pass the content to ``writer``
+        instead of writing it to disk
+
+        Parameters
+        ------------
+        writer: Callable[[:class:`bytes`], Any]
+            A callable that will receive downloaded chunks,
+            for example ``write`` method of a file object.
+        progress_bar: :class:`bool`
+            Enable/Disable progress bar,
+            default to `True`
+        """
+        log.info('Downloading "%s"', self.name)
+        downloader = StreamDownloader(
+            self.download_url,
+            writer,
+            progress_bar=progress_bar
+        )
+        downloader.download()
+        downloader.cleanup()
+        log.info('Successfully downloaded "%s"', self.name)
+
     async def download_coro(
         self,
         progress_bar: bool=True,
@@ -144,11 +168,12 @@ class File:
         else:
             _filename = self.name
             extra_word = ''
-        log.info('%s "%s" %s' % (
+        log.info(
+            '%s "%s" %s',
             'Fast Downloading' if fast else 'Downloading',
             self.name,
             extra_word
-        ))
+        )
         file_path = (Path('.') / (folder if folder else '') / _filename)
         file_path.parent.mkdir(exist_ok=True, parents=True)
         args = (
@@ -163,7 +188,7 @@ class File:
             downloader = AsyncFileDownloader(*args)
         await downloader.download()
         await downloader.cleanup()
-        log.info('Successfully downloaded "%s" %s' % (self.name, extra_word))
+        log.info('Successfully downloaded "%s" %s', self.name, extra_word)
         return file_path
 
     def to_JSON(self) -> str:
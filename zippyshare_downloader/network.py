@@ -1,6 +1,8 @@
 import requests
 import aiohttp
 import asyncio
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 __all__ = (
     'Net', 'NetworkObject',
@@ -14,6 +16,26 @@ class requestsProxiedSession(requests.Session):
         super().__init__()
         self.trust_env = trust_env
 
+        # Bigger connection pool and retry on failed connections,
+        # connections are kept alive and reused between requests.
+        # Only connection errors are retried, HTTP errors (and "Retry-After" header)
+        # are returned immediately, so raise_for_status() can handle it
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                connect=3,
+                read=0,
+                status=0,
+                backoff_factor=0.3,
+                raise_on_status=False,
+                respect_retry_after_header=False
+            )
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
     def __del__(self):
         self.close()
 
@@ -137,7 +159,16 @@ class NetworkObject:
             raise RuntimeError('created aiohttp session cannot be used in different thread')
 
         if self._aiohttp is None:
-            self._aiohttp = aiohttpProxiedSession(self.proxy)
+            # Keep connections alive and reuse them
+            # instead of doing new handshake for every requests
+            connector = aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=8,
+                enable_cleanup_closed=True,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._aiohttp = aiohttpProxiedSession(self.proxy, connector=connector)
             self._update_aiohttp_proxy(self.proxy)
 
     def close(self):
@@ -52,15 +52,19 @@ def parse_info(url, body_html) -> Dict[str, str]:
     log.exception('all patterns parser failed to get required informations')
     raise ParserError('all patterns parser is failed to get required informations')
 
-def _get_absolute_filename(info):
-    r = Net.requests.get(info['download_url'], stream=True)
+def _get_absolute_filename(info, session=None):
+    if session is None:
+        session = Net.requests
+    r = session.get(info['download_url'], stream=True)
     new_namefile = r.headers['Content-Disposition'].replace('attachment; filename*=UTF-8\'\'', '')
     info['name_file'] = urllib.parse.unquote(new_namefile)
     r.close()
     return info
 
-async def _get_absolute_filename_coro(info):
-    resp = await Net.aiohttp.get(info['download_url'])
+async def _get_absolute_filename_coro(info, session=None):
+    if session is None:
+        session = Net.aiohttp
+    resp = await session.get(info['download_url'])
     new_namefile = resp.headers['Content-Disposition'].replace('attachment; filename*=UTF-8\'\'', '')
     info['name_file'] = urllib.parse.unquote(new_namefile)
     resp.close()
@@ -69,7 +73,7 @@ async def _get_absolute_filename_coro(info):
 async def __dummy_return(info):
     return info
 
-def finalization_info(info, _async=False) -> Dict[str, str]:
+def finalization_info(info, _async=False, session=None) -> Dict[str, str]:
     """
     Fix if required informations contains invalid info.
     """
@@ -86,9 +90,9 @@ def finalization_info(info, _async=False) -> Dict[str, str]:
     
     if error:
         if _async:
-            return _get_absolute_filename_coro(info)
+            return _get_absolute_filename_coro(info, session)
         else:
-            return _get_absolute_filename(info)
+            return _get_absolute_filename(info, session)
     else:
         if _async:
             return __dummy_return(info)
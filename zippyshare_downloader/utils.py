@@ -4,6 +4,10 @@
 import re
 import os
 import math
+import shutil
+import asyncio
+import functools
+import contextvars
 import tarfile
 import zipfile
 import logging
@@ -92,18 +96,33 @@ def extract_archived_file(file) -> None:
         zip_file.extractall(Path(file).parent)
         zip_file.close()
 
+def extract_archived_files(files) -> None:
+    """Extract all files from multiple archive files, see :meth:`extract_archived_file`"""
+    for file in files:
+        extract_archived_file(str(file))
 
 def archive_zip(downloaded_files, name):
-    path = list(downloaded_files.values())[0]
+    path = next(iter(downloaded_files.values()))
     zip_path = (path.parent / name)
-    with zipfile.ZipFile(zip_path, 'w') as zip_writer:
+    to_delete = []
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zip_writer:
         for file, path in downloaded_files.items():
-            log.debug('Writing "%s" to "%s"' % (
-                path,
-                zip_path
-            ))
-            zip_writer.write(path)
-            os.remove(path)
+            log.debug('Writing "%s" to "%s"', path, zip_path)
+            # Build ZipInfo from single stat() call (keeping mode, mtime and size)
+            # and copy the file with bigger chunks than ZipFile.write()
+            zip_info = zipfile.ZipInfo.from_file(path, path.name)
+            zip_info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as src, zip_writer.open(zip_info, 'w', force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            to_delete.append(path)
+
+    # Delete the files only after zip file is successfully closed,
+    # so the files are not lost if zipping is failed
+    for path in to_delete:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            log.warning('Failed to delete "%s", %s: %s', path, e.__class__.__name__, e)
 
 def build_pretty_list_log(iterable, word, spacing=4):
     word = '%s = [\n' % word
@@ -119,3 +138,12 @@ def build_pretty_list_log(iterable, word, spacing=4):
     word += ']'
     return word
 
+async def to_thread(func, *args, **kwargs):
+    """Run ``func`` in default executor, same like :func:`asyncio.to_thread`
+    which is not available in Python 3.7 and 3.8
+    """
+    if hasattr(asyncio, 'to_thread'):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(ctx.run, func, *args, **kwargs))